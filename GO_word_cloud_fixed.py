@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
+# pandas、wordcloud 在用到时才导入，加快 --help / --list-fonts 的启动速度
 import argparse
+import csv
+import functools
 import os
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
 import matplotlib.font_manager as fm
 
 # 预设的配色方案（为不同的GO类别设计）
@@ -20,10 +22,40 @@ COLOR_SCHEMES = {
     'elegant': [(0.2, 0.2, 0.5), (0.4, 0.2, 0.4), (0.6, 0.2, 0.3)]
 }
 
+def _build_ramp(stops):
+    """预先计算256级颜色渐变表 (256x3 uint8)，在颜色列表中线性插值"""
+    stops = np.asarray(stops, dtype=float)
+    x = np.arange(256)
+    xp = np.linspace(0, 255, len(stops))
+    ramp = np.stack([np.interp(x, xp, stops[:, c]) for c in range(3)], axis=1)
+    return (ramp * 255).astype(np.uint8)
+
+# 各配色方案的颜色渐变表
+COLOR_RAMPS = {name: _build_ramp(stops) for name, stops in COLOR_SCHEMES.items()}
+
+# 输入文件必须包含的列
+REQUIRED_COLS = frozenset(['ID', 'Description', 'ONTOLOGY', 'OccurrenceCount'])
+
+# 字体名称索引缓存（首次使用时构建）
+_FONT_INDEX = None
+_FONT_NAMES = None
+
+def _get_font_index():
+    """获取 {小写字体名: 字体文件路径} 索引"""
+    global _FONT_INDEX
+    if _FONT_INDEX is None:
+        _FONT_INDEX = {}
+        for f in fm.fontManager.ttflist:
+            # 保留第一个匹配项，与原先的线性查找结果一致
+            _FONT_INDEX.setdefault(f.name.lower(), f.fname)
+    return _FONT_INDEX
+
 def list_available_fonts():
     """列出系统可用的字体"""
-    fonts = sorted([f.name for f in fm.fontManager.ttflist])
-    return fonts
+    global _FONT_NAMES
+    if _FONT_NAMES is None:
+        _FONT_NAMES = sorted([f.name for f in fm.fontManager.ttflist])
+    return _FONT_NAMES
 
 def get_font_path(font_name):
     """获取指定字体的路径"""
@@ -34,41 +66,195 @@ def get_font_path(font_name):
     if os.path.isfile(font_name) and (font_name.endswith('.ttf') or font_name.endswith('.otf')):
         return font_name
 
-    # 查找系统字体
-    fonts = [f for f in fm.fontManager.ttflist if font_name.lower() in f.name.lower()]
-    if fonts:
-        return fonts[0].fname
+    # 查找系统字体：先精确匹配，再按子串匹配
+    font_index = _get_font_index()
+    key = font_name.lower()
+    if key in font_index:
+        return font_index[key]
+    for name, fname in font_index.items():
+        if key in name:
+            return fname
     return None
 
-def filter_by_ontology(df, ontology=None):
-    """根据本体类别筛选数据"""
-    if ontology is None or ontology.upper() == 'ALL':
-        return df
-    return df[df['ONTOLOGY'] == ontology.upper()]
+def _pick_rgb(freq, inv_max, lut):
+    """按词频在颜色查找表中取色"""
+    i = int(freq * inv_max)
+    if i > 255:
+        i = 255
+    return lut[i, 0], lut[i, 1], lut[i, 2]
+
+# 值得使用 numba 编译取色函数的最少调用次数：冷缓存下编译约 0.4 秒，
+# 每次调用只节省约 2 微秒，调用次数不到约 20 万次时编译反而更慢
+_JIT_MIN_CALLS = 200000
+
+# 编译后的取色函数（首次使用时构建）
+_PICK_RGB_JIT = None
+
+def _get_pick_rgb(use_jit=False):
+    """获取取色函数：use_jit 为真且安装了 numba 时使用 JIT 编译版本，否则使用纯 Python 版本"""
+    global _PICK_RGB_JIT
+    if not use_jit:
+        return _pick_rgb
+    if _PICK_RGB_JIT is None:
+        try:
+            from numba import njit
+            _PICK_RGB_JIT = njit(cache=True)(_pick_rgb)
+        except ImportError:
+            _PICK_RGB_JIT = _pick_rgb
+    return _PICK_RGB_JIT
+
+def _make_color_func(freq_dict, lut, global_max_freq):
+    """根据词频和颜色查找表创建颜色函数"""
+    # 归一化系数（使用全局最大频率）
+    inv_max = 255.0 / global_max_freq
+    pick_rgb = _get_pick_rgb(_WORKER_USE_JIT)
+
+    def custom_color_func(word, font_size, position, orientation, random_state=None, **kwargs):
+        """根据词频和预设配色方案创建颜色"""
+        r, g, b = pick_rgb(freq_dict.get(word, 1), inv_max, lut)
+        return (int(r), int(g), int(b))
+
+    return custom_color_func
+
+# 是否已为 ImageFont.truetype 加上缓存
+_TRUETYPE_CACHED = False
+
+def _cache_truetype():
+    """为 PIL 的 ImageFont.truetype 加上 LRU 缓存
+
+    wordcloud 在缩小字号寻找位置时会为每个候选字号重新加载字体，
+    缓存 (字体路径, 字号) 对应的字体对象可以避免重复加载。
+    """
+    global _TRUETYPE_CACHED
+    if _TRUETYPE_CACHED:
+        return
+    from PIL import ImageFont
+
+    truetype = getattr(ImageFont.truetype, '__wrapped__', ImageFont.truetype)
+    ImageFont.truetype = functools.lru_cache(maxsize=512)(truetype)
+    _TRUETYPE_CACHED = True
+
+# 子进程内共用的词云对象、默认颜色函数和随机种子（由 _init_worker 创建）
+_WORKER_WC = None
+_WORKER_DEFAULT_COLOR_FUNC = None
+_WORKER_SEED = None
+_WORKER_USE_JIT = False
+
+def _init_worker(wc_kwargs, use_jit=False):
+    """工作进程初始化：创建一次词云对象，供该进程内的所有GO类别复用"""
+    from wordcloud import WordCloud
+
+    global _WORKER_WC, _WORKER_DEFAULT_COLOR_FUNC, _WORKER_SEED, _WORKER_USE_JIT
+    _cache_truetype()
+    _WORKER_WC = WordCloud(**wc_kwargs)
+    _WORKER_DEFAULT_COLOR_FUNC = _WORKER_WC.color_func
+    _WORKER_SEED = wc_kwargs['random_state']
+    _WORKER_USE_JIT = use_jit
+
+def _save_image(img, ontology, output_file):
+    """保存词云图，返回是否成功（在主进程的后台线程中运行）"""
+    # 直接保存词云生成的图像，不经过 matplotlib 重新渲染；
+    # 使用低压缩级别以加快 PNG 编码（安装 pillow-simd 可进一步加速）
+    try:
+        img.save(output_file, format='PNG', compress_level=1, optimize=False)
+    except Exception as e:
+        print(f"❌ 保存{ontology}词云图失败: {str(e)}")
+        return False
+    return True
+
+def _render_one(ontology, freq_dict, lut, global_max_freq, output_file, derived=(), word_to_ont=None):
+    """生成并保存单个GO类别的词云图（在子进程中运行）
+
+    derived 为 (子类别, 词频字典, 颜色查找表, 输出文件) 列表：本次布局容纳了
+    全部词时，这些子类别直接复用该布局，只保留属于该子类别的词并重新着色；
+    否则把它们作为需要单独生成布局的任务返回，交给进程池并行处理。
+    返回 ((类别, 输出文件, 实际显示的词数, 图像) 列表, 待单独生成的任务列表)，
+    图像由调用方在后台线程中保存。
+    """
+    # 颜色函数在子进程内重建，避免闭包跨进程传递
+    if lut is not None:
+        color_func = _make_color_func(freq_dict, lut, global_max_freq)
+    else:
+        color_func = _WORKER_DEFAULT_COLOR_FUNC
+
+    # 复用词云对象，只替换颜色函数
+    wc = _WORKER_WC
+    wc.color_func = color_func
+
+    # 生成词云：WordCloud 在构造时把整数种子转换为一个 Random 对象并持续使用，
+    # 复用时需重新设置，保证每个GO类别的布局与单独生成时一致
+    wc.random_state = random.Random(_WORKER_SEED)
+    wc.generate_from_frequencies(freq_dict)
+    layout = wc.layout_
+
+    # 画布未能容纳全部词时，子类别的词可能缺失，不能从该布局中截取
+    fallback = []
+    if len(layout) < len(freq_dict):
+        fallback = [(sub_ontology, sub_freq_dict, sub_lut, global_max_freq, sub_output_file)
+                    for sub_ontology, sub_freq_dict, sub_lut, sub_output_file in derived]
+        derived = ()
+
+    results = [(ontology, output_file, len(layout), wc.to_image())]
+
+    # 从已生成的布局中筛选各子类别的词
+    for sub_ontology, _, sub_lut, sub_output_file in derived:
+        if sub_lut is not None:
+            sub_color_func = _make_color_func(freq_dict, sub_lut, global_max_freq)
+        else:
+            sub_color_func = None
+
+        sub_layout = []
+        for (word, freq), font_size, position, orientation, color in layout:
+            if word_to_ont.get(word) != sub_ontology:
+                continue
+            if sub_color_func is not None:
+                color = sub_color_func(word, font_size, position, orientation)
+            sub_layout.append(((word, freq), font_size, position, orientation, color))
+
+        wc.layout_ = sub_layout
+        results.append((sub_ontology, sub_output_file, len(sub_layout), wc.to_image()))
+    wc.layout_ = layout
+
+    return results, fallback
+
+def _render_one_star(task):
+    """ProcessPoolExecutor.map 的参数解包辅助函数"""
+    return _render_one(*task)
 
 def generate_go_wordcloud(input_file, output_prefix='go_wordcloud', use_id=False,
                          width=1200, height=800, background_color="white", max_words=1000,
                          font_name=None, color_scheme=None, random_state=42,
                          generate_all=True, generate_bp=True, generate_cc=True, generate_mf=True):
     """生成GO富集结果的词云图"""
+    import pandas as pd
 
-    # 读取数据
+    # 读取数据：根据首行判断分隔符，只解析需要的列
     try:
-        df = pd.read_csv(input_file)
-    except:
+        with open(input_file, encoding='utf-8-sig') as f:
+            header = f.readline()
+        sep = '\t' if '\t' in header else ','
+        header_cols = next(csv.reader([header], delimiter=sep))
+        usecols = [col for col in header_cols if col in REQUIRED_COLS]
+        # 读取时直接将词频列解析为 int32，减少后续处理的内存占用
+        dtype = {'OccurrenceCount': 'int32'} if 'OccurrenceCount' in usecols else None
         try:
-            df = pd.read_csv(input_file, sep="\t")
-        except Exception as e:
-            print(f"❌ 无法读取输入文件: {e}")
-            return False
+            df = pd.read_csv(input_file, sep=sep, engine='pyarrow', usecols=usecols, dtype=dtype)
+        except ImportError:
+            # 未安装 pyarrow 时退回默认的 C 解析器
+            df = pd.read_csv(input_file, sep=sep, usecols=usecols, dtype=dtype)
+    except Exception as e:
+        print(f"❌ 无法读取输入文件: {e}")
+        return False
 
     # 检查必要列
-    required_cols = ['ID', 'Description', 'ONTOLOGY', 'OccurrenceCount']
-    missing_cols = [col for col in required_cols if col not in df.columns]
+    missing_cols = REQUIRED_COLS.difference(df.columns)
     if missing_cols:
-        print(f"❌ 输入文件缺少必要的列: {', '.join(missing_cols)}")
+        print(f"❌ 输入文件缺少必要的列: {', '.join(sorted(missing_cols))}")
         return False
 
+    # 本体类别转为 category 类型，比较和分组只需处理整数编码
+    df['ONTOLOGY'] = df['ONTOLOGY'].astype('category')
+
     # 获取字体路径
     font_path = get_font_path(font_name)
     if font_name and font_path:
@@ -80,9 +266,20 @@ def generate_go_wordcloud(input_file, output_prefix='go_wordcloud', use_id=False
     # 确定词云使用的文本字段
     text_field = 'ID' if use_id else 'Description'
 
-    # 创建完整的词频字典（用于 ALL 分类）
-    all_freq_dict = dict(zip(df[text_field], df['OccurrenceCount']))
-    global_max_freq = max(all_freq_dict.values())  # 全局最大频率
+    def top_freq_dict(data):
+        """取词频最高的 max_words 个条目构建词频字典（其余条目词云也不会显示）"""
+        top = data.nlargest(max_words, 'OccurrenceCount')
+        return dict(zip(top[text_field].to_numpy(), top['OccurrenceCount'].to_numpy()))
+
+    # 一次分组，预先计算各GO类别的词频字典和条目数
+    counts = df['ONTOLOGY'].value_counts().to_dict()
+    freq_dicts = {
+        ontology: top_freq_dict(group)
+        for ontology, group in df.groupby('ONTOLOGY', sort=False, observed=True)
+    }
+    # 完整的词频字典（用于 ALL 分类）
+    freq_dicts['ALL'] = top_freq_dict(df)
+    global_max_freq = max(freq_dicts['ALL'].values())  # 全局最大频率
 
     # 设置每个GO类别的配色和输出文件名
     ontology_settings = {
@@ -92,6 +289,21 @@ def generate_go_wordcloud(input_file, output_prefix='go_wordcloud', use_id=False
         'MF': {'color': 'MF', 'title': '分子功能(MF)词云图', 'file': f"{output_prefix}_mf.png"}
     }
 
+    # 词云参数（各GO类别共用；直接使用词频生成，不需要分词相关参数）
+    wc_kwargs = {
+        'width': width,
+        'height': height,
+        'background_color': background_color,
+        'max_words': max_words,
+        'prefer_horizontal': 0.9,
+        'min_font_size': 10,
+        'max_font_size': 180,
+        'font_step': 1,
+        'relative_scaling': 0.5,
+        'font_path': font_path,
+        'random_state': random_state
+    }
+
     # 判断需要生成哪些词云图
     generate_flags = {
         'ALL': generate_all,
@@ -99,107 +311,95 @@ def generate_go_wordcloud(input_file, output_prefix='go_wordcloud', use_id=False
         'CC': generate_cc,
         'MF': generate_mf
     }
-
-    # 生成各个GO类别的词云图
-    for ontology, settings in ontology_settings.items():
-        if not generate_flags[ontology]:
-            continue
-
-        # 根据本体类别筛选数据
-        filtered_df = filter_by_ontology(df, ontology)
-
-        if len(filtered_df) == 0:
+    selected = [(o, ontology_settings[o]) for o in ('ALL', 'BP', 'CC', 'MF') if generate_flags[o]]
+
+    # 同时生成 ALL 和子类别词云图，且 ALL 包含全部条目（未被 max_words 截断）时，
+    # 各子类别可以直接复用 ALL 的布局，需要知道每个词所属的类别
+    fuse = False
+    word_to_ont = None
+    if generate_all and (generate_bp or generate_cc or generate_mf):
+        fuse = len(freq_dicts['ALL']) == df[text_field].nunique()
+        if fuse:
+            word_to_ont = dict(zip(df[text_field].to_numpy(), df['ONTOLOGY'].to_numpy()))
+
+    # 准备各个GO类别的渲染任务
+    tasks = []
+    all_task = None
+    for ontology, settings in selected:
+        # 获取该类别的词频字典
+        freq_dict = freq_dicts.get(ontology)
+
+        if freq_dict is None:
             print(f"⚠️ 没有找到{ontology}类别的GO条目，跳过生成词云图")
             continue
 
-        # 创建该类别的词频字典
-        freq_dict = dict(zip(filtered_df[text_field], filtered_df['OccurrenceCount']))
-
         # 如果词典为空，跳过
         if not freq_dict:
             print(f"⚠️ {ontology}类别的词频字典为空，跳过生成词云图")
             continue
 
-        print(f"🔍 为{ontology}类别生成词云图，包含{len(freq_dict)}个GO条目")
+        print(f"🔍 为{ontology}类别生成词云图")
 
         # 获取特定GO类别的配色方案
         go_color_scheme = color_scheme if color_scheme else settings['color']
+        lut = COLOR_RAMPS.get(go_color_scheme)
 
-        # 创建颜色函数
-        if go_color_scheme in COLOR_SCHEMES:
-            colors = COLOR_SCHEMES[go_color_scheme]
-
-            def custom_color_func(word, font_size, position, orientation, random_state=None, **kwargs):
-                """根据词频和预设配色方案创建颜色"""
-                # 获取词的频率
-                freq = freq_dict.get(word, 1)
-                # 归一化频率（使用全局最大频率）
-                freq_norm = min(1.0, freq / global_max_freq)
-
-                # 根据频率在颜色列表中插值
-                idx = min(int(freq_norm * (len(colors) - 1) * 100), len(colors) - 2)
-                start_color = colors[idx // 100]
-                end_color = colors[min(idx // 100 + 1, len(colors) - 1)]
-                t = (idx % 100) / 100.0
-
-                # 线性插值
-                r = start_color[0] * (1-t) + end_color[0] * t
-                g = start_color[1] * (1-t) + end_color[1] * t
-                b = start_color[2] * (1-t) + end_color[2] * t
-
-                return (int(r*255), int(g*255), int(b*255))
-
-            color_func = custom_color_func
-        else:
-            color_func = None
-
-        # 创建词云对象
-        wc = WordCloud(
-            width=width,
-            height=height,
-            background_color=background_color,
-            max_words=max_words,
-            color_func=color_func,
-            prefer_horizontal=0.9,
-            min_font_size=10,
-            max_font_size=180,
-            font_step=1,
-            collocations=False,
-            relative_scaling=0.5,
-            regexp=r"[\w\s\:\-]+",
-            font_path=font_path,
-            random_state=random_state
-        )
-
-        # 对于 ALL 分类，使用完整的词频字典
-        if ontology == 'ALL':
-            wordcloud_data = all_freq_dict
-        else:
-            wordcloud_data = freq_dict
-
-        # 生成词云
-        wc.generate_from_frequencies(wordcloud_data)
-
-        # 创建图形并显示
-        plt.figure(figsize=(width/100, height/100), dpi=100, facecolor=background_color)
-        plt.imshow(wc, interpolation='bilinear')
-        plt.axis("off")
-        plt.tight_layout(pad=0)
-
-        # 保存图片
-        output_file = settings['file']
-        try:
-            plt.savefig(output_file, dpi=300, bbox_inches='tight', facecolor=background_color)
-            print(f"✅ {ontology}词云图已保存到: {output_file}")
-        except Exception as e:
-            print(f"❌ 保存{ontology}词云图失败: {str(e)}")
+        # 已有 ALL 任务时，子类别并入其中复用布局
+        if all_task is not None:
+            all_task[5].append((ontology, freq_dict, lut, settings['file']))
+            continue
 
-        plt.close()
+        task = (ontology, freq_dict, lut, global_max_freq, settings['file'], [], word_to_ont)
+        tasks.append(task)
+        if ontology == 'ALL' and fuse:
+            all_task = task
+
+    # 取色函数调用次数（实际参与着色的词数）足够多时才值得用 numba 编译
+    n_calls = sum(len(task[1]) + sum(len(d[1]) for d in task[5]) for task in tasks)
+    use_jit = n_calls >= _JIT_MIN_CALLS
+
+    # PNG 编码时 Pillow 会释放 GIL，生成好的图片交给贯穿整个渲染过程的后台线程池保存，
+    # 与后续布局的生成重叠进行
+    saves = []
+    io_pool = ThreadPoolExecutor(max_workers=2)
+
+    def save_outputs(outputs):
+        """提交生成好的图片到后台线程保存，返回需要单独生成布局的子类别任务"""
+        fallback_tasks = []
+        for results, fallback in outputs:
+            for ontology, output_file, n_words, img in results:
+                saves.append((ontology, output_file, n_words,
+                              io_pool.submit(_save_image, img, ontology, output_file)))
+            fallback_tasks.extend(fallback)
+        return fallback_tasks
+
+    # 多进程并行生成各个GO类别的词云图；只有一个任务时直接在当前进程中生成，
+    # 省去启动子进程和重新导入模块的开销。ALL 布局未能容纳全部词时，
+    # 返回的子类别任务进入下一轮并行生成
+    pending = tasks
+    worker_ready = False
+    try:
+        while pending:
+            if len(pending) == 1:
+                if not worker_ready:
+                    _init_worker(wc_kwargs, use_jit)
+                    worker_ready = True
+                pending = save_outputs([_render_one_star(pending[0])])
+            else:
+                with ProcessPoolExecutor(max_workers=min(4, os.cpu_count() or 1, len(pending)),
+                                         initializer=_init_worker, initargs=(wc_kwargs, use_jit)) as ex:
+                    pending = save_outputs(ex.map(_render_one_star, pending))
+    finally:
+        io_pool.shutdown(wait=True)
+
+    for ontology, output_file, n_words, future in saves:
+        if future.result():
+            print(f"✅ {ontology}词云图已保存到: {output_file}，包含{n_words}个GO条目")
 
     # 显示统计信息
-    bp_count = len(df[df['ONTOLOGY'] == 'BP'])
-    cc_count = len(df[df['ONTOLOGY'] == 'CC'])
-    mf_count = len(df[df['ONTOLOGY'] == 'MF'])
+    bp_count = counts.get('BP', 0)
+    cc_count = counts.get('CC', 0)
+    mf_count = counts.get('MF', 0)
 
     print(f"\n📊 GO富集结果统计:")
     print(f"  • 总GO条目: {len(df)}个")
@@ -212,7 +412,7 @@ def generate_go_wordcloud(input_file, output_prefix='go_wordcloud', use_id=False
 def main():
     # 解析命令行参数
     parser = argparse.ArgumentParser(description='生成GO富集结果词云图')
-    parser.add_argument('-i', '--input', required=True,
+    parser.add_argument('-i', '--input',
                         help='输入的GO富集统计CSV/TSV文件，包含ID、Description、ONTOLOGY和OccurrenceCount列')
     parser.add_argument('-o', '--output', default='go_wordcloud',
                         help='输出的词云图文件前缀 (默认: go_wordcloud)')
@@ -253,6 +453,9 @@ def main():
             print(f"{i}. {font}")
         return
 
+    if not args.input:
+        parser.error('生成词云图需要指定输入文件 (-i/--input)')
+
     # 生成词云
     generate_go_wordcloud(
         args.input, args.output, args.use_id,